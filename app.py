@@ -4,7 +4,9 @@ import pandas as pd
 import sqlite3
 import os
 import io
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
+import numpy as np
 from werkzeug.utils import secure_filename
 import matplotlib
 matplotlib.use("Agg")
@@ -31,8 +33,10 @@ BASE_DIR      = os.path.dirname(os.path.abspath(__file__))
 DB_PATH       = os.path.join(BASE_DIR, "database.db")
 STATIC_PATH   = os.path.join(BASE_DIR, "static")
 UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
+LOG_STORE     = os.path.join(BASE_DIR, "log_store")
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(LOG_STORE, exist_ok=True)
 os.makedirs(STATIC_PATH, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
@@ -153,6 +157,181 @@ def get_filtered_df(date_from=None, date_to=None):
     conn.close()
     return df
 
+def parse_duration(val):
+    """'h:mm:ss' or 'm:ss' → seconds (0 if unparseable)."""
+    try:
+        parts = str(val).strip().split(':')
+        if len(parts)==3: return int(parts[0])*3600+int(parts[1])*60+int(parts[2])
+        if len(parts)==2: return int(parts[0])*60+int(parts[1])
+    except: pass
+    return 0
+
+# ───────────────────────────────────────────────────────
+# RAW LOG STORE
+# ───────────────────────────────────────────────────────
+#
+#  Append-only columnar store for ingested call/fax rows:
+#    log_store/<kind>/<employee>/<YYYY-MM>/<segment>.<column>.npy
+#  Columns: ts  (int64, seconds since epoch, naive local time)
+#           dur (float32, seconds)
+#  Segments are written once and read back memory-mapped, so drill-down
+#  queries scan arrays without materialising rows as Python objects.
+
+LOG_KINDS   = ("calls", "faxes")
+LOG_COLUMNS = {"ts": np.int64, "dur": np.float32}
+FAX_MINUTES = 20   # flat minutes credited per fax (scoring + raw log store)
+
+def naive_timestamp(val):
+    """One value → naive Timestamp keeping its own wall clock; NaT if unparseable."""
+    try:
+        ts = pd.Timestamp(val)
+    except (ValueError, TypeError, OverflowError):
+        return pd.NaT
+    if ts is pd.NaT: return ts
+    return ts.tz_localize(None) if ts.tzinfo else ts
+
+def to_naive_datetimes(values):
+    """Parse date strings/datetimes to naive datetimes; tz-aware values keep their wall clock.
+
+    Numbers (and numeric strings) are NaT rather than being read as epoch offsets.
+    """
+    is_str = values.map(lambda v: isinstance(v, str))
+    usable = values.map(lambda v: isinstance(v, (datetime, np.datetime64))) | (
+        is_str & ~values.astype(str).str.fullmatch(r"\s*[-+]?[\d.]+\s*"))
+    values = values.where(usable).astype(object)
+    try:
+        parsed = pd.to_datetime(values, errors='coerce', format='mixed')
+    except ValueError:  # mixed UTC offsets, or naive mixed with aware
+        parsed = None
+    if parsed is None or parsed.dtype == object:
+        return pd.Series([naive_timestamp(v) for v in values],
+                         index=values.index, dtype='datetime64[ns]')
+    if getattr(parsed.dtype, "tz", None) is not None:
+        parsed = parsed.dt.tz_localize(None)
+    return parsed
+
+def row_timestamps(df, exclude=()):
+    """Per-row epoch seconds plus a mask of rows whose date/time could be parsed.
+
+    Uses a combined date/time column, or a date column plus a start-time column
+    ("time", "start", "start time", ...).  Columns in exclude (e.g. the duration)
+    are never used; a missing or unparseable clock falls back to midnight.
+    """
+    cols     = [c for c in df.columns if c not in exclude]
+    date_col = next((c for c in cols if 'date' in c), None)
+    time_col = next((c for c in cols if c == 'time' or 'start' in c), None)
+    if date_col is None and time_col is None:
+        return np.zeros(len(df), dtype=np.int64), np.zeros(len(df), dtype=bool)
+    if date_col is None or time_col is None or date_col == time_col:
+        parsed = to_naive_datetimes(df[date_col if date_col is not None else time_col])
+    else:
+        day    = to_naive_datetimes(df[date_col]).dt.normalize()
+        clock  = to_naive_datetimes(df[time_col].map(lambda v: v if isinstance(v, datetime) else str(v)))
+        parsed = day + (clock - clock.dt.normalize()).fillna(pd.Timedelta(0))
+    ok = parsed.notna().to_numpy()
+    ts = np.zeros(len(df), dtype=np.int64)
+    ts[ok] = parsed[ok].astype('datetime64[s]').to_numpy().astype(np.int64)
+    return ts, ok
+
+def store_log_rows(kind, employee, analytics_id, df, dur, exclude=()):
+    """Parse and append rows to the log store; never lets a store failure fail the upload."""
+    try:
+        ts, ok  = row_timestamps(df, exclude)
+        skipped = int((~ok).sum())
+        if skipped:
+            print(f"Log store: {skipped} {kind} row(s) for {employee} skipped (no parseable date/time)")
+        append_log_segment(kind, employee, analytics_id, ts[ok], np.asarray(dur)[ok])
+    except Exception as e:
+        print(f"Log store error: {e}"); traceback.print_exc()
+
+def append_log_segment(kind, employee, analytics_id, ts, dur):
+    """Write one immutable segment per (employee, month), tagged with its analytics row id."""
+    ts  = np.asarray(ts,  dtype=LOG_COLUMNS["ts"])
+    dur = np.asarray(dur, dtype=LOG_COLUMNS["dur"])
+    if ts.size == 0: return
+    months = ts.astype('datetime64[s]').astype('datetime64[M]')
+    seg_id = f"{analytics_id}-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    for month in np.unique(months):
+        mask = months == month
+        part = os.path.join(LOG_STORE, kind, secure_filename(employee), str(month))
+        os.makedirs(part, exist_ok=True)
+        # "ts" is published last: readers only see a segment once all its columns exist.
+        for name, col in (("dur", dur[mask]), ("ts", ts[mask])):
+            tmp = os.path.join(part, f".{seg_id}.{name}.tmp.npy")
+            np.save(tmp, col)
+            os.replace(tmp, os.path.join(part, f"{seg_id}.{name}.npy"))
+
+def delete_log_segments(analytics_id):
+    """Remove every segment written for an analytics row ("ts" first, so readers skip it)."""
+    prefix = f"{analytics_id}-"
+    for root, _, files in os.walk(LOG_STORE):
+        for fname in files:
+            if fname.startswith(prefix) and fname.endswith(".ts.npy"):
+                seg = fname[:-len(".ts.npy")]
+                for name in ("ts", "dur"):
+                    try: os.remove(os.path.join(root, f"{seg}.{name}.npy"))
+                    except FileNotFoundError: pass
+
+def iter_log_segments(kind, employee, month_from=None, month_to=None):
+    """Yield memory-mapped (ts, dur) arrays for 'YYYY-MM' partitions in the range."""
+    emp_dir = os.path.join(LOG_STORE, kind, secure_filename(employee))
+    if not os.path.isdir(emp_dir): return
+    for month in sorted(os.listdir(emp_dir)):
+        if (month_from and month < month_from) or (month_to and month > month_to): continue
+        part = os.path.join(emp_dir, month)
+        for fname in sorted(os.listdir(part)):
+            if fname.startswith('.') or not fname.endswith(".ts.npy"): continue
+            seg = fname[:-len(".ts.npy")]
+            try:
+                yield (np.load(os.path.join(part, f"{seg}.ts.npy"),  mmap_mode='r'),
+                       np.load(os.path.join(part, f"{seg}.dur.npy"), mmap_mode='r'))
+            except FileNotFoundError:  # incomplete or concurrently deleted segment
+                continue
+
+def parse_date_arg(val):
+    """'YYYY-MM-DD'-ish string → naive Timestamp (None if empty); raises ValueError if invalid."""
+    if not val: return None
+    ts = pd.Timestamp(val)
+    if ts is pd.NaT: raise ValueError(f"invalid date: {val!r}")
+    return ts.tz_localize(None) if ts.tzinfo else ts
+
+def log_distribution(kind, date_from=None, date_to=None, employees=None):
+    """Per-employee count / minutes / hourly / weekday distribution of raw log rows.
+
+    date_from and date_to are inclusive dates (strings or Timestamps).
+    """
+    date_from, date_to = parse_date_arg(date_from), parse_date_arg(date_to)
+    lo = np.datetime64(date_from.normalize(), 's') if date_from is not None else None
+    hi = np.datetime64(date_to.normalize() + timedelta(days=1), 's') if date_to is not None else None
+    month_from = str(lo.astype('datetime64[M]'))               if lo is not None else None
+    month_to   = str(np.datetime64(date_to.normalize(), 'M'))  if hi is not None else None
+    lo = lo.astype(np.int64) if lo is not None else None
+    hi = hi.astype(np.int64) if hi is not None else None
+    result = {}
+    for emp in (employees or EMPLOYEES):
+        count, total = 0, 0.0
+        by_hour = np.zeros(24, dtype=np.int64)
+        by_day  = np.zeros(7,  dtype=np.int64)
+        for ts, dur in iter_log_segments(kind, emp, month_from, month_to):
+            mask = np.ones(ts.shape, dtype=bool)
+            if lo is not None: mask &= ts >= lo
+            if hi is not None: mask &= ts <  hi
+            sel = ts[mask]
+            if sel.size == 0: continue
+            count   += int(sel.size)
+            total   += float(dur[mask].sum(dtype=np.float64))
+            by_hour += np.bincount((sel // 3600) % 24, minlength=24)
+            by_day  += np.bincount((sel // 86400 + 3) % 7, minlength=7)  # 1970-01-01 was a Thursday
+        minutes = total / 60
+        result[emp] = {
+            "count":       count,
+            "minutes":     round(minutes, 2),
+            "avg_minutes": round(minutes / count, 2) if count else 0,
+            "by_hour":     by_hour.tolist(),
+            "by_weekday":  by_day.tolist(),   # Monday first
+        }
+    return result
+
 # ───────────────────────────────────────────────────────
 # FILE PROCESSING
 # ───────────────────────────────────────────────────────
@@ -231,13 +410,8 @@ def process_calls(filepath, employee, upload_label=""):
         if new_df.empty:
             conn.close(); return 0
 
-        total_mins = 0
-        for _, row in new_df.iterrows():
-            try:
-                parts = str(row[dur_col]).strip().split(':')
-                if len(parts)==3: total_mins += int(parts[0])*60+int(parts[1])+int(parts[2])/60
-                elif len(parts)==2: total_mins += int(parts[0])+int(parts[1])/60
-            except: pass
+        dur_secs   = new_df[dur_col].map(parse_duration).to_numpy(dtype=np.float64)
+        total_mins = dur_secs.sum() / 60
 
         date_val = datetime.now().strftime("%Y-%m-%d")
         cursor.execute(
@@ -247,10 +421,14 @@ def process_calls(filepath, employee, upload_label=""):
         if res:
             cursor.execute("UPDATE analytics SET total_calls=total_calls+?,call_minutes=call_minutes+? WHERE id=?",
                            (len(new_df),total_mins,res[0]))
+            row_id = res[0]
         else:
             cursor.execute("INSERT INTO analytics(employee,date,upload_label,total_calls,call_minutes) VALUES(?,?,?,?,?)",
                            (employee,date_val,upload_label,len(new_df),total_mins))
-        conn.commit(); return len(new_df)
+            row_id = cursor.lastrowid
+        conn.commit()
+        store_log_rows("calls", employee, row_id, new_df, dur_secs, exclude=(dur_col,))
+        return len(new_df)
     except Exception as e:
         print(f"Calls error: {e}"); traceback.print_exc(); return 0
     finally:
@@ -271,7 +449,7 @@ def process_faxes(filepath, employee, upload_label=""):
             conn.close(); return 0
 
         total_faxes = len(new_df)
-        fax_minutes = total_faxes * 20
+        fax_minutes = total_faxes * FAX_MINUTES
         date_val = datetime.now().strftime("%Y-%m-%d")
 
         cursor.execute(
@@ -281,10 +459,15 @@ def process_faxes(filepath, employee, upload_label=""):
         if res:
             cursor.execute("UPDATE analytics SET total_faxes=total_faxes+?,fax_minutes=fax_minutes+? WHERE id=?",
                            (total_faxes,fax_minutes,res[0]))
+            row_id = res[0]
         else:
             cursor.execute("INSERT INTO analytics(employee,date,upload_label,total_faxes,fax_minutes) VALUES(?,?,?,?,?)",
                            (employee,date_val,upload_label,total_faxes,fax_minutes))
-        conn.commit(); return total_faxes
+            row_id = cursor.lastrowid
+        conn.commit()
+        store_log_rows("faxes", employee, row_id, new_df,
+                       np.full(total_faxes, FAX_MINUTES*60, dtype=np.float32))
+        return total_faxes
     except Exception as e:
         print(f"Faxes error: {e}"); traceback.print_exc(); return 0
     finally:
@@ -479,10 +662,29 @@ def delete_upload(row_id):
     conn = sqlite3.connect(DB_PATH)
     conn.execute("DELETE FROM analytics WHERE id=?", (row_id,))
     conn.commit(); conn.close()
+    delete_log_segments(row_id)
     flash("✓ Upload entry deleted. Dashboard reflects the remaining data.")
     return redirect(url_for("dashboard"))
 
 
+@app.route("/api/log_distribution")
+@login_required
+def api_log_distribution():
+    kind = request.args.get("kind","calls")
+    if kind not in LOG_KINDS:
+        return jsonify({"error": f"kind must be one of {', '.join(LOG_KINDS)}"}), 400
+    employee  = request.args.get("employee","")
+    if employee and employee not in EMPLOYEES:
+        return jsonify({"error": "unknown employee"}), 400
+    try:
+        date_from = parse_date_arg(request.args.get("date_from",""))
+        date_to   = parse_date_arg(request.args.get("date_to",""))
+    except ValueError:
+        return jsonify({"error": "date_from/date_to must be dates (YYYY-MM-DD)"}), 400
+    return jsonify(log_distribution(kind, date_from, date_to,
+                                    [employee] if employee else None))
+
+
 # ── PDF Export ─────────────────────────────
 
 @app.route("/export/pdf")